@@ -1,11 +1,41 @@
 import yaml
 import httpx
 import asyncio
-from typing import Dict, List, Optional, Set
+import heapq
+import json
+import os
+import shutil
+import statistics
+import tempfile
+from typing import Any, Dict, List, Optional, Set, Tuple
 import sys
-from datetime import datetime
-from asyncio import Semaphore
+import time
+from datetime import datetime, timedelta
 import argparse
+from urllib.parse import quote, urlparse
+
+try:
+    # 优先使用 libyaml 的 C 实现，解析/输出大型配置时速度快一个数量级
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+
+try:
+    # 可选依赖：aiohttp 的单请求开销低于 httpx，安装后优先使用
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    # 可选依赖：orjson 解析 JSON 比标准库快数倍
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+if aiohttp is not None:
+    REQUEST_ERRORS = (httpx.HTTPError, aiohttp.ClientError, asyncio.TimeoutError)
+else:
+    REQUEST_ERRORS = (httpx.HTTPError,)
 
 # 配置参数
 TEST_URL = "http://www.gstatic.com/generate_204"
@@ -14,6 +44,11 @@ CLASH_API_HOST = "127.0.0.1"
 CLASH_API_SECRET = ""
 TIMEOUT = 5
 MAX_CONCURRENT_TESTS = 100
+CACHE_TTL = 300  # 测试结果缓存有效期（秒），0 表示不使用缓存
+BACKOFF_BASE = 600  # 节点失败后首次跳过测试的时长（秒），之后每次失败翻倍
+BACKOFF_CAP = 86400  # 失败退避的最长跳过时长（秒）
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "proxyclean", "delays.json")
+CACHE_VERSION = 2  # 缓存文件格式版本，格式不兼容时忽略旧文件
 
 
 class ClashAPIException(Exception):
@@ -21,51 +56,219 @@ class ClashAPIException(Exception):
     pass
 
 
+def _to_monotonic(dt: datetime) -> float:
+    """将系统时间换算为 time.monotonic() 时间点"""
+    return time.monotonic() - (datetime.now() - dt).total_seconds()
+
+
+def _to_datetime(monotonic: float) -> datetime:
+    """将 time.monotonic() 时间点换算为系统时间"""
+    return datetime.now() - timedelta(seconds=time.monotonic() - monotonic)
+
+
 class ProxyTestResult:
     """代理测试结果类"""
 
-    def __init__(self, name: str, delay: Optional[float] = None):
+    __slots__ = ("name", "delay", "status", "tested_monotonic", "fail_count", "next_check_monotonic")
+
+    def __init__(self, name: str, delay: Optional[float] = None,
+                 tested_time: Optional[datetime] = None, fail_count: int = 0,
+                 next_check_time: Optional[datetime] = None):
         self.name = name
         self.delay = delay if delay is not None else float('inf')
         self.status = "ok" if delay is not None else "fail"
-        self.tested_time = datetime.now()
+        # 内部使用单调时钟计时，系统时间仅在显示和写入缓存文件时换算
+        self.tested_monotonic = time.monotonic() if tested_time is None else _to_monotonic(tested_time)
+        self.fail_count = fail_count  # 连续失败次数
+        # 失败退避结束前不再测试
+        self.next_check_monotonic = _to_monotonic(next_check_time) if next_check_time else None
+
+    def __eq__(self, other):
+        if not isinstance(other, ProxyTestResult):
+            return NotImplemented
+        return self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
 
     @property
     def is_valid(self) -> bool:
         return self.status == "ok"
 
+    @property
+    def tested_time(self) -> datetime:
+        return _to_datetime(self.tested_monotonic)
+
+    @property
+    def next_check_time(self) -> Optional[datetime]:
+        if self.next_check_monotonic is None:
+            return None
+        return _to_datetime(self.next_check_monotonic)
+
+    def to_dict(self) -> Dict:
+        """转换为可写入缓存文件的字典"""
+        return {
+            "delay": self.delay if self.is_valid else None,
+            "tested_time": self.tested_time.isoformat(),
+            "fail_count": self.fail_count,
+            "next_check_time": self.next_check_time.isoformat() if self.next_check_time else None
+        }
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict) -> "ProxyTestResult":
+        """从缓存文件中的字典恢复测试结果"""
+        next_check_time = data.get("next_check_time")
+        return cls(
+            name,
+            data.get("delay"),
+            datetime.fromisoformat(data["tested_time"]),
+            data.get("fail_count", 0),
+            datetime.fromisoformat(next_check_time) if next_check_time else None
+        )
+
 
 class ClashAPI:
-    def __init__(self, host: str, ports: List[int], secret: str = ""):
+    def __init__(self, host: str, ports: List[int], secret: str = "",
+                 cache_ttl: int = CACHE_TTL, cache_file: str = CACHE_FILE,
+                 force: bool = False, config_path: str = ""):
         self.host = host
         self.ports = ports
         self.base_url = None  # 将在连接检查时设置
+        # 延迟测试请求的 URL 前后缀和参数，连接成功后预先生成
+        self._delay_prefix = ""
+        self._delay_suffix = "/delay"
+        self._delay_params = {"url": TEST_URL, "timeout": TIMEOUT * 1000}
         self.headers = {
             "Authorization": f"Bearer {secret}" if secret else "",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(timeout=TIMEOUT)
-        self.semaphore = Semaphore(MAX_CONCURRENT_TESTS)
+        # 连接池与并发数保持一致，并复用 keep-alive 连接，避免每个请求重新建立 TCP 连接
+        self._use_aiohttp = aiohttp is not None
+        if self._use_aiohttp:
+            self.client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=MAX_CONCURRENT_TESTS,
+                    limit_per_host=MAX_CONCURRENT_TESTS,
+                    force_close=False
+                ),
+                timeout=aiohttp.ClientTimeout(total=TIMEOUT)
+            )
+        else:
+            limits = httpx.Limits(
+                max_connections=MAX_CONCURRENT_TESTS,
+                max_keepalive_connections=MAX_CONCURRENT_TESTS,
+                keepalive_expiry=30.0
+            )
+            self.client = httpx.AsyncClient(
+                timeout=TIMEOUT,
+                limits=limits,
+                http2=False,
+                transport=httpx.AsyncHTTPTransport(retries=0, limits=limits)
+            )
+            # 直接构造 Request 通过 send 发送时不会合并客户端配置，需自带超时设置
+            self._request_extensions = {"timeout": self.client.timeout.as_dict()}
+        # 请求头只规范化一次，之后每个请求复用
+        self._request_headers = self.headers if self._use_aiohttp else httpx.Headers(self.headers)
+        # 缓存按 API 地址、配置文件和测试参数分区，不同订阅中的同名节点互不影响；
+        # 当前分区在连接成功后选定
+        self._cache_scopes: Dict[str, Dict[str, ProxyTestResult]] = {}
         self._test_results_cache: Dict[str, ProxyTestResult] = {}
+        self._probed: Set[str] = set()  # 本次运行实际测试过的节点
+        self.cache_ttl = cache_ttl
+        self.cache_file = cache_file
+        self.force = force
+        self.config_path = os.path.realpath(config_path) if config_path else ""
 
     async def __aenter__(self):
+        self._load_cache()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        if self._use_aiohttp:
+            await self.client.close()
+        else:
+            await self.client.aclose()
+        self._save_cache()
+
+    def _load_cache(self):
+        """从磁盘加载上次运行的测试结果缓存"""
+        if self.cache_ttl <= 0:
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return
+            for scope, entries in data["scopes"].items():
+                self._cache_scopes[scope] = {
+                    name: ProxyTestResult.from_dict(name, entry) for name, entry in entries.items()
+                }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"读取测试结果缓存失败，将重新测试所有节点: {e}")
+            self._cache_scopes.clear()
+
+    def _save_cache(self):
+        """将未过期的测试结果缓存原子地写入磁盘"""
+        if self.cache_ttl <= 0 or not self._cache_scopes:
+            return
+        # 丢弃已过期且不在失败退避期内的记录，避免缓存文件无限增长
+        now = time.monotonic()
+        scopes = {}
+        for scope, entries in self._cache_scopes.items():
+            live = {
+                name: r.to_dict() for name, r in entries.items()
+                if now - r.tested_monotonic < self.cache_ttl
+                or (r.next_check_monotonic and now < r.next_check_monotonic)
+            }
+            if live:
+                scopes[scope] = live
+        data = {"version": CACHE_VERSION, "scopes": scopes}
+        cache_dir = os.path.dirname(self.cache_file)
+        tmp_file = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # 每次使用唯一的临时文件，多个实例同时运行时不会互相覆盖写到一半的文件
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, prefix=".delays.", suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            print(f"保存测试结果缓存失败: {e}")
+            if tmp_file and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    async def _get_json(self, url: str, headers: Optional[Any] = None,
+                        params: Optional[Dict] = None) -> Tuple[int, Any]:
+        """发送 GET 请求，返回状态码和解析后的 JSON（请求失败时为 None）"""
+        if self._use_aiohttp:
+            async with self.client.get(url, headers=headers, params=params) as response:
+                if response.status >= 400:
+                    return response.status, None
+                return response.status, await response.json(loads=json_loads, content_type=None)
+
+        request = httpx.Request("GET", url, headers=headers, params=params,
+                                extensions=self._request_extensions)
+        response = await self.client.send(request)
+        if response.status_code >= 400:
+            return response.status_code, None
+        return response.status_code, json_loads(response.content)
 
     async def check_connection(self) -> bool:
         """检查与 Clash API 的连接状态，自动尝试不同端口"""
         for port in self.ports:
             try:
                 test_url = f"http://{self.host}:{port}"
-                response = await self.client.get(f"{test_url}/version")
-                if response.status_code == 200:
-                    version = response.json().get('version', 'unknown')
+                status, data = await self._get_json(f"{test_url}/version")
+                if status == 200:
+                    version = data.get('version', 'unknown')
                     print(f"成功连接到 Clash API (端口 {port})，版本: {version}")
                     self.base_url = test_url
+                    self._delay_prefix = f"{test_url}/proxies/"
+                    self._test_results_cache = self._cache_scopes.setdefault(self._cache_scope(), {})
                     return True
-            except httpx.RequestError:
+            except REQUEST_ERRORS:
                 print(f"端口 {port} 连接失败，尝试下一个端口...")
                 continue
 
@@ -73,53 +276,73 @@ class ClashAPI:
         print(f"请确保 Clash 正在运行，并且 External Controller 已启用于以下端口之一: {', '.join(map(str, self.ports))}")
         return False
 
+    def _cache_scope(self) -> str:
+        """当前连接对应的缓存分区键"""
+        return "|".join((self.base_url, self.config_path, TEST_URL, str(TIMEOUT)))
+
+    def _delay_url_for(self, proxy_name: str) -> str:
+        """生成指定节点的延迟测试 URL"""
+        return self._delay_prefix + quote(proxy_name, safe='') + self._delay_suffix
+
     async def get_proxies(self) -> Dict:
         """获取所有代理节点信息"""
         if not self.base_url:
             raise ClashAPIException("未建立与 Clash API 的连接")
 
         try:
-            response = await self.client.get(
+            status, data = await self._get_json(
                 f"{self.base_url}/proxies",
-                headers=self.headers
+                headers=self._request_headers
             )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                print("认证失败，请检查 API Secret 是否正确")
-            raise ClashAPIException(f"HTTP 错误: {e}")
-        except httpx.RequestError as e:
+        except REQUEST_ERRORS as e:
             raise ClashAPIException(f"请求错误: {e}")
 
+        if status >= 400:
+            if status == 401:
+                print("认证失败，请检查 API Secret 是否正确")
+            raise ClashAPIException(f"HTTP 错误: {status}")
+        return data
+
     async def test_proxy_delay(self, proxy_name: str) -> ProxyTestResult:
         """测试指定代理节点的延迟，使用缓存避免重复测试"""
         if not self.base_url:
             raise ClashAPIException("未建立与 Clash API 的连接")
 
         # 检查缓存
-        if proxy_name in self._test_results_cache:
-            cached_result = self._test_results_cache[proxy_name]
-            # 如果测试结果不超过60秒，直接返回缓存的结果
-            if (datetime.now() - cached_result.tested_time).total_seconds() < 60:
+        now = time.monotonic()
+        cached_result = self._test_results_cache.get(proxy_name)
+        if cached_result is not None and proxy_name in self._probed:
+            return cached_result
+        if cached_result is not None and not self.force:
+            # 如果测试结果仍在有效期内，直接返回缓存的结果
+            if now - cached_result.tested_monotonic < self.cache_ttl:
+                return cached_result
+            # 连续失败的节点在退避期内直接视为失效，不发起请求
+            if cached_result.next_check_monotonic and now < cached_result.next_check_monotonic:
                 return cached_result
 
-        async with self.semaphore:
-            try:
-                response = await self.client.get(
-                    f"{self.base_url}/proxies/{proxy_name}/delay",
-                    headers=self.headers,
-                    params={"url": TEST_URL, "timeout": TIMEOUT * 1000}
-                )
-                response.raise_for_status()
-                delay = response.json().get("delay")
-                result = ProxyTestResult(proxy_name, delay)
-            except httpx.HTTPError:
-                result = ProxyTestResult(proxy_name)
-
-            # 更新缓存
-            self._test_results_cache[proxy_name] = result
-            return result
+        # 并发数由调用方的 worker 数量控制，这里不再加锁
+        try:
+            _, data = await self._get_json(
+                self._delay_url_for(proxy_name),
+                headers=self._request_headers,
+                params=self._delay_params
+            )
+            delay = data.get("delay") if data is not None else None
+            result = ProxyTestResult(proxy_name, delay)
+        except REQUEST_ERRORS:
+            result = ProxyTestResult(proxy_name)
+
+        # 失败时按连续失败次数指数退避，成功时清零
+        if not result.is_valid:
+            result.fail_count = (cached_result.fail_count if cached_result else 0) + 1
+            backoff = min(BACKOFF_BASE * 2 ** (result.fail_count - 1), BACKOFF_CAP)
+            result.next_check_monotonic = result.tested_monotonic + backoff
+
+        # 更新缓存
+        self._test_results_cache[proxy_name] = result
+        self._probed.add(proxy_name)
+        return result
 
 
 class ClashConfig:
@@ -128,13 +351,19 @@ class ClashConfig:
     def __init__(self, config_path: str):
         self.config_path = config_path
         self.config = self._load_config()
+        # 记录加载时的配置摘要，保存时据此判断是否需要重写文件
+        self._initial_hash = self._config_hash()
         self.proxy_groups = self._get_proxy_groups()
+        # 按名称索引代理组，避免每次查找都线性扫描；
+        # remove_invalid_proxies 和 update_group_proxies 只修改组内容，索引始终有效
+        self._group_index: Dict[str, Dict] = {g["name"]: g for g in self.proxy_groups}
 
     def _load_config(self) -> dict:
         """加载配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            # 以二进制方式读取，由 libyaml 直接处理 UTF-8 解码
+            with open(self.config_path, 'rb') as f:
+                return yaml.load(f, Loader=YamlLoader)
         except FileNotFoundError:
             print(f"找不到配置文件: {self.config_path}")
             sys.exit(1)
@@ -142,25 +371,26 @@ class ClashConfig:
             print(f"配置文件格式错误: {e}")
             sys.exit(1)
 
+    def _config_hash(self) -> int:
+        """计算当前配置内容的摘要"""
+        return hash(repr(self.config))
+
     def _get_proxy_groups(self) -> List[Dict]:
         """获取所有代理组信息"""
         return self.config.get("proxy-groups", [])
 
     def get_group_names(self) -> List[str]:
         """获取所有代理组名称"""
-        return [group["name"] for group in self.proxy_groups]
+        return list(self._group_index)
 
     def get_group_proxies(self, group_name: str) -> List[str]:
         """获取指定组的所有代理"""
-        for group in self.proxy_groups:
-            if group["name"] == group_name:
-                return group.get("proxies", [])
-        return []
+        return self._group_index.get(group_name, {}).get("proxies", [])
 
     def remove_invalid_proxies(self, results: List[ProxyTestResult]):
         """从配置中完全移除失效的节点"""
         # 获取所有失效节点名称
-        invalid_proxies = {r.name for r in results if not r.is_valid}
+        invalid_proxies = frozenset(r.name for r in results if not r.is_valid)
 
         if not invalid_proxies:
             return
@@ -174,37 +404,56 @@ class ClashConfig:
 
         # 从所有代理组中移除失效节点
         for group in self.proxy_groups:
-            if "proxies" in group:
-                group["proxies"] = [p for p in group["proxies"]
-                                    if p not in invalid_proxies]
+            proxies = group.get("proxies")
+            # 不含失效节点的组无需重建列表
+            if not proxies or invalid_proxies.isdisjoint(proxies):
+                continue
+            group["proxies"] = [p for p in proxies if p not in invalid_proxies]
 
         print(f"\n已从配置中移除 {len(invalid_proxies)} 个失效节点")
 
     def update_group_proxies(self, group_name: str, results: List[ProxyTestResult]):
-        """更新指定组的代理列表，仅保留有效节点并按延迟排序"""
-        # 移除失效节点
-        self.remove_invalid_proxies(results)
+        """更新指定组的代理列表，仅保留有效节点并按延迟排序
 
+        失效节点应事先通过 remove_invalid_proxies 一次性移除。
+        """
         # 获取有效节点并按延迟排序
         valid_results = [r for r in results if r.is_valid]
         valid_results = list(set(valid_results))
         valid_results.sort(key=lambda x: x.delay)
 
         # 更新代理组
-        for group in self.proxy_groups:
-            if group["name"] == group_name:
-                group["proxies"] = [r.name for r in valid_results]
-                break
+        group = self._group_index.get(group_name)
+        if group is not None:
+            group["proxies"] = [r.name for r in valid_results]
 
     def save(self):
-        """保存配置到文件"""
+        """保存配置到文件，配置未变化时跳过"""
+        if self._config_hash() == self._initial_hash:
+            print(f"配置未发生变化，无需保存: {self.config_path}")
+            return
+
+        # 解析符号链接，替换的是链接指向的真实文件而不是链接本身
+        real_path = os.path.realpath(self.config_path)
+        tmp_path = None
         try:
-            # 保存新配置
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(self.config, f, allow_unicode=True, sort_keys=False)
+            # 在同一目录下写入临时文件再原子替换，避免写入中断导致配置文件损坏
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(real_path),
+                                            prefix=f".{os.path.basename(real_path)}.", suffix=".tmp")
+            # 以二进制方式由 emitter 直接编码写入，并放宽行宽减少折行处理
+            with os.fdopen(fd, 'wb') as f:
+                yaml.dump(self.config, f, Dumper=YamlDumper, allow_unicode=True, sort_keys=False,
+                          default_flow_style=False, width=4096, encoding='utf-8')
+            # 保留原文件权限，配置中包含节点密码，不能因替换而放宽
+            if os.path.exists(real_path):
+                shutil.copymode(real_path, tmp_path)
+            os.replace(tmp_path, real_path)
+            self._initial_hash = self._config_hash()
             print(f"新配置已保存到: {self.config_path}")
         except Exception as e:
             print(f"保存配置文件失败: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             sys.exit(1)
 
 
@@ -222,12 +471,12 @@ def print_test_summary(group_name: str, results: List[ProxyTestResult]):
     print(f"失效节点数: {invalid}")
 
     if valid > 0:
-        avg_delay = sum(r.delay for r in valid_results) / valid
+        avg_delay = statistics.fmean(r.delay for r in valid_results)
         print(f"平均延迟: {avg_delay:.2f}ms")
 
         print("\n延迟最低的前5个节点:")
-        sorted_results = sorted(valid_results, key=lambda x: x.delay)
-        for i, result in enumerate(sorted_results[:5], 1):
+        top5 = heapq.nsmallest(5, valid_results, key=lambda x: x.delay)
+        for i, result in enumerate(top5, 1):
             print(f"{i}. {result.name}: {result.delay:.2f}ms")
 
     if invalid > 0:
@@ -240,19 +489,41 @@ async def test_group_proxies(clash_api: ClashAPI, proxies: List[str]) -> List[Pr
     """测试一组代理节点"""
     print(f"开始测试 {len(proxies)} 个节点 (最大并发: {MAX_CONCURRENT_TESTS})")
 
-    # 创建所有测试任务
-    tasks = [clash_api.test_proxy_delay(proxy_name) for proxy_name in proxies]
+    total = len(proxies)
+    results: List[Optional[ProxyTestResult]] = [None] * total
+    counter = [0]
+
+    def _write_progress():
+        done = counter[0]
+        sys.stdout.write(f"\r进度: {done}/{total} ({done / total * 100:.1f}%)")
+        sys.stdout.flush()
 
-    # 使用进度显示执行所有任务
-    results = []
-    for future in asyncio.as_completed(tasks):
-        result = await future
-        results.append(result)
-        # 显示进度
-        done = len(results)
-        total = len(tasks)
-        print(f"\r进度: {done}/{total} ({done / total * 100:.1f}%)", end="", flush=True)
+    async def _reporter():
+        # 以固定频率刷新进度，测试协程只负责累加计数
+        while counter[0] < total:
+            _write_progress()
+            await asyncio.sleep(0.1)
 
+    # 固定数量的 worker 从同一个迭代器中依次取节点，同时进行的请求数不超过最大并发，
+    # 且某个节点超时不会阻塞其他 worker 继续测试
+    pending = iter(enumerate(proxies))
+
+    async def _worker():
+        for i, proxy_name in pending:
+            results[i] = await clash_api.test_proxy_delay(proxy_name)
+            counter[0] += 1
+
+    reporter_task = asyncio.create_task(_reporter())
+    workers = [asyncio.create_task(_worker()) for _ in range(min(max(1, MAX_CONCURRENT_TESTS), total))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        reporter_task.cancel()
+
+    if total:
+        _write_progress()
     print("\n")  # 换行
     return results
 
@@ -270,9 +541,33 @@ def parse_arguments():
                         help=f'测试超时时间（秒）(默认: {TIMEOUT})')
     parser.add_argument('-p', '--ports', type=int, nargs='*', default=CLASH_API_PORTS,
                         help=f'Clash API 端口列表 (默认: {" ".join(map(str, CLASH_API_PORTS))})')
+    parser.add_argument('-u', '--url',
+                        help='Clash API 地址，如 http://127.0.0.1:9090 (指定后覆盖 --ports)')
     parser.add_argument('-s', '--secret',
                         help='Clash API Secret')
-    return parser.parse_args()
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL,
+                        help=f'测试结果缓存有效期（秒），0 表示不使用缓存 (默认: {CACHE_TTL})')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略缓存和失败退避，重新测试所有节点')
+    args = parser.parse_args()
+
+    if args.concurrent < 1:
+        parser.error(f"最大并发测试数量必须大于 0: {args.concurrent}")
+
+    # 兼容旧版的 -u/--url 参数，从地址中解析出主机和端口
+    args.host = CLASH_API_HOST
+    if args.url:
+        url = args.url if "://" in args.url else f"http://{args.url}"
+        try:
+            parsed = urlparse(url)
+            port = parsed.port
+        except ValueError:
+            parser.error(f"无效的 API 地址: {args.url}")
+        if not parsed.hostname or port is None:
+            parser.error(f"API 地址需包含主机和端口: {args.url}")
+        args.host = parsed.hostname
+        args.ports = [port]
+    return args
 
 
 async def main():
@@ -286,9 +581,11 @@ async def main():
 
     print(f"Clash 节点测试和清理工具")
     print(f"配置文件: {args.config}")
+    print(f"API 主机: {args.host}")
     print(f"API 端口: {args.ports}")
     print(f"并发数量: {MAX_CONCURRENT_TESTS}")
     print(f"超时时间: {TIMEOUT}秒")
+    print(f"缓存有效期: {args.cache_ttl}秒")
 
     # 加载配置
     config = ClashConfig(args.config)
@@ -309,39 +606,42 @@ async def main():
     print(f"\n将测试以下策略组: {', '.join(groups_to_test)}")
 
     # 开始测试
-    start_time = datetime.now()
+    start_time = time.monotonic()
 
     # 创建支持多端口的API实例
-    async with ClashAPI(CLASH_API_HOST, args.ports, CLASH_API_SECRET) as clash_api:
+    async with ClashAPI(args.host, args.ports, CLASH_API_SECRET,
+                        cache_ttl=args.cache_ttl, force=args.force,
+                        config_path=args.config) as clash_api:
         if not await clash_api.check_connection():
             return
 
         try:
-            all_test_results = []  # 收集所有测试结果
-
-            # 测试每个策略组
+            # 汇总各策略组的节点，同一节点出现在多个组中时只测试一次
+            group_proxies_map: Dict[str, List[str]] = {}
             for group_name in groups_to_test:
-                print(f"\n======================== 开始测试策略组: {group_name} ====================")
                 proxies = config.get_group_proxies(group_name)
-
                 if not proxies:
                     print(f"策略组 '{group_name}' 中没有代理节点")
                     continue
+                group_proxies_map[group_name] = proxies
 
-                # 测试该组的所有节点
-                results = await test_group_proxies(clash_api, proxies)
-                all_test_results.extend(results)
+            all_names = sorted({p for proxies in group_proxies_map.values() for p in proxies})
+            all_test_results = await test_group_proxies(clash_api, all_names)
+            results_by_name = {r.name: r for r in all_test_results}
 
-                # 打印测试结果摘要
-                print_test_summary(group_name, results)
+            # 按策略组打印测试结果摘要
+            for group_name, proxies in group_proxies_map.items():
+                print(f"\n======================== 策略组: {group_name} ====================")
+                group_results = [results_by_name[p] for p in proxies if p in results_by_name]
+                print_test_summary(group_name, group_results)
 
             # 一次性移除所有失效节点并更新配置
             config.remove_invalid_proxies(all_test_results)
 
             # 为每个组更新有效节点的顺序
-            for group_name in groups_to_test:
-                group_proxies = config.get_group_proxies(group_name)
-                group_results = [r for r in all_test_results if r.name in group_proxies]
+            for group_name in group_proxies_map:
+                group_results = [results_by_name[p] for p in config.get_group_proxies(group_name)
+                                 if p in results_by_name]
                 config.update_group_proxies(group_name, group_results)
                 print(f"已更新策略组 '{group_name}' 的节点顺序")
 
@@ -349,7 +649,7 @@ async def main():
             config.save()
 
             # 显示总耗时
-            total_time = (datetime.now() - start_time).total_seconds()
+            total_time = time.monotonic() - start_time
             print(f"\n总耗时: {total_time:.2f} 秒")
 
         except ClashAPIException as e:
@@ -359,7 +659,19 @@ async def main():
             raise
 
 
+def install_uvloop():
+    """安装 uvloop 事件循环（可选依赖），提升大量并发请求时的调度效率"""
+    if sys.platform == 'win32':
+        return
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
 if __name__ == "__main__":
+    install_uvloop()
     try:
         asyncio.run(main())
     except KeyboardInterrupt: